@@ -3,17 +3,20 @@ import dash.development.base_component
 import data_db_csv
 import logging_config
 
-from dash import Dash, dcc, html, callback, Input, State, Output, ctx, no_update
+from dash import Dash, dcc, html, callback, clientside_callback, ClientsideFunction, \
+    Input, State, Output, Patch, ctx, no_update
 from dash.development.base_component import Component
 from dash.exceptions import PreventUpdate
+import flask
 import plotly.graph_objects as go
 import plotly.io as pio
 import pandas as pd
-import json
+import numpy as np
 from datetime import datetime, timedelta, time, timezone
 import locale
-from functools import cmp_to_key
-from typing import Iterable
+import threading
+from functools import lru_cache
+from typing import Iterable, NamedTuple
 
 
 RadioOptionsType = list[dict[str, str | bool]]
@@ -36,6 +39,32 @@ TRACE_COLORS = [
 DATE_PICKER_FORMAT = 'Y-MM-DD'
 # color scale for topography
 TOPO_COLORSCALE = [(0, '#3c855e'), (.4, '#ffd39e'), (1, '#88594d')]
+# (maximum date span in days, frequency) pairs for which the frequency
+#   gives less than 8 date slider marks
+MARK_FREQS = [(6, 'D'), (13, '2D'), (20, '3D'), (48, 'W'), (97, '2W'), (195, 'MS'),
+              (391, '2MS'), (587, '3MS'), (1175, '6MS'), (2554, 'YS'), (5109, '2YS')]
+# total number of scatterplot points above which WebGL traces are used
+#   (SVG rendering becomes slow for many points)
+SCATTERGL_MIN_POINTS = 2000
+
+
+class DailyData(NamedTuple):
+    """
+    Daily precipitation of all stations in flat arrays sorted by station and date.
+    """
+    # daily amounts
+    amounts: np.ndarray | None
+    # days of `amounts` as offsets from the first date in `date_range`
+    days: np.ndarray | None
+    # half-open range of rows of each station
+    station_rows: dict[str, tuple[int, int]]
+    # first and last date covered by data
+    date_range: tuple[datetime, datetime]
+
+    # snapshots are compared by identity so that a snapshot can be part of
+    #   the key of cached results
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
 
 
 def sorted_locale(x: Iterable[str]) -> list[str]:
@@ -48,9 +77,25 @@ def sorted_locale(x: Iterable[str]) -> list[str]:
     Returns:
         Data sorted according to current locale.
     """
-    return sorted(x, key=cmp_to_key(locale.strcoll))
+    # precomputed collation keys are used for station names
+    return sorted(x, key=lambda s: station_sort_keys.get(s) or locale.strxfrm(s))
 
 
+@lru_cache(maxsize=128)
+def sorted_stations(stations: frozenset[str]) -> tuple[str, ...]:
+    """
+    Cached locale-aware sorting of a set of station names.
+
+    Args:
+        stations: station names
+
+    Returns:
+        Station names sorted according to current locale.
+    """
+    return tuple(sorted_locale(stations))
+
+
+@lru_cache(maxsize=None)
 def hex_to_rgb(color: str, alpha: float = None) -> str:
     """
     Translates a hex color representation to rgb (rgba when alpha is given).
@@ -71,7 +116,8 @@ def hex_to_rgb(color: str, alpha: float = None) -> str:
     """
 
     # hex to comma-separated integers, e.g., '#ff00ff' -> '255, 0, 255'
-    rgb = ', '.join([str(int(color[i:i + 2], 16)) for i in [1, 3, 5]])
+    value = int(color[1:], 16)
+    rgb = f'{value >> 16 & 0xff}, {value >> 8 & 0xff}, {value & 0xff}'
     if alpha is None:
         return f'rgb({rgb})'
     else:
@@ -89,38 +135,67 @@ def date_marks(start: datetime, end: datetime) -> tuple[pd.DatetimeIndex, list[s
     Returns:
 
     """
-    # find the highest frequency with less than 10 timepoints
-    freqs = ['D', '2D', '3D', 'W', '2W', 'MS', '2MS', '3MS', '6MS', 'YS', '2YS']
-    for freq in freqs:
-        timepoints = pd.date_range(start, end, freq=freq)
-        if len(timepoints) < 8:
-            break
-    else:
+    # find the highest frequency with less than 8 timepoints
+    span = (end - start).days
+    freq = next((f for max_span, f in MARK_FREQS if span <= max_span), None)
+    if freq is None:
         timepoints = pd.date_range(start, end, periods=2)
+    else:
+        timepoints = pd.date_range(start, end, freq=freq)
 
     # keep only first occurrence of each year
-    years = list(map(str, timepoints.year))
-    yr = ''
-    for i in range(len(years)):
-        if years[i] == yr:
-            years[i] = ''
-        else:
-            yr = years[i]
+    years = timepoints.year.to_numpy()
+    first = np.diff(years, prepend=-1) != 0
+    years = np.where(first, years.astype(str), '')
     days = timepoints.strftime(f'{day_of_month_code}. %b')
     labels = [f'{d} {y}' for y, d in zip(years, days)]
 
     return timepoints, labels
 
 
+@lru_cache(maxsize=8)
+def slider_marks(start: datetime, end: datetime) -> dict[int, str]:
+    """
+    Creates marks for the date range slider, which are cached until the
+        date range changes.
+
+    Args:
+        start: start date
+        end: end date
+
+    Returns:
+        Mark labels by their positions (days from `start`).
+    """
+    dates_at, labels = date_marks(start, end)
+    return dict(zip((dates_at - start).days, labels))
+
+
 def update_daily_data() -> None:
     """
-    Retrieves daily data from the database and sets the `daily_data` and
-         `date_range` global variables accordingly
+    Retrieves daily data from the database and sets the `daily_data` global
+        variable accordingly. Data are published by a single assignment so that
+        callbacks running in other threads never see a mix of old and new data.
     """
     global daily_data
-    global date_range
-    daily_data = data_db_csv.get_daily_precipitation(station_names_translator)
-    date_range = daily_data['date'].min(), daily_data['date'].max()
+    df = data_db_csv.get_daily_precipitation(station_names_translator)
+    dates = df.index.get_level_values('date')
+    date_range = dates.min(), dates.max()
+
+    # data are sorted by station and date, so each station's data occupy
+    #   a contiguous range of rows in flat arrays of amounts and day offsets
+    station_codes = df.index.codes[0]
+    all_codes = np.arange(len(df.index.levels[0]))
+    starts = np.searchsorted(station_codes, all_codes, side='left')
+    stops = np.searchsorted(station_codes, all_codes, side='right')
+    daily_data = DailyData(
+        amounts=df['amount'].to_numpy(np.float32),
+        days=(dates - date_range[0]).days.to_numpy(np.int32),
+        station_rows={station: (start, stop)
+                      for station, start, stop in zip(df.index.levels[0], starts, stops)
+                      if stop > start},
+        date_range=date_range)
+    # cached summaries of the previous data will not be used anymore
+    summarize_stations.cache_clear()
 
 
 def try_data_update():
@@ -130,7 +205,7 @@ def try_data_update():
     """
     global next_data_update_time
 
-    if data_db_csv.get_max_db_date() > date_range[1].date():
+    if data_db_csv.get_max_db_date() > daily_data.date_range[1].date():
         update_daily_data()
         # schedule new update at UPDATE_TIME today or (typically) tomorrow
         #   if it's already past that time today
@@ -147,6 +222,135 @@ def try_data_update():
     next_data_update_time = datetime.now(timezone.utc) + timedelta(seconds=1)
 
 
+def daily_data_by_station(data: DailyData,
+                          stations: Iterable[str],
+                          first_day: int,
+                          last_day: int) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Selects daily data for given stations and range of days.
+
+    Args:
+        data: daily data snapshot
+        stations: station names
+        first_day: first day of the range as an offset from the first date in data
+        last_day: last day of the range as an offset from the first date in data
+
+    Returns:
+        Dates and amounts arrays for each station.
+    """
+    first_date = data.date_range[0].to_datetime64().astype('datetime64[D]')
+
+    by_station = {}
+    for station in stations:
+        # stations without any data get empty arrays
+        start, stop = data.station_rows.get(station, (0, 0))
+        # find the half-open interval of days within the station's rows
+        days = data.days[start:stop]
+        i_start, i_end = start + np.searchsorted(days, [first_day, last_day + 1])
+        by_station[station] = (first_date + data.days[i_start:i_end],
+                               data.amounts[i_start:i_end])
+
+    return by_station
+
+
+def marker_sizes(amounts: np.ndarray) -> np.ndarray:
+    """
+    Computes sizes of scatterplot markers; markers for values of 0 will
+        not be shown.
+
+    Args:
+        amounts: precipitation amounts
+
+    Returns:
+        Marker sizes.
+    """
+    return np.where(amounts == 0, 0, 7).astype(np.int8)
+
+
+def scatter_trace_class(by_station: dict[str, tuple[np.ndarray, np.ndarray]]) -> type:
+    """
+    Chooses the scatterplot trace class according to the number of points.
+
+    Args:
+        by_station: (dates, amounts) tuples by station
+
+    Returns:
+        `go.Scattergl` for more than `SCATTERGL_MIN_POINTS` points in total,
+            `go.Scatter` otherwise
+    """
+    n_points = sum(len(amounts) for _, amounts in by_station.values())
+    return go.Scattergl if n_points > SCATTERGL_MIN_POINTS else go.Scatter
+
+
+def grouped_summary(values: np.ndarray, lengths: np.ndarray, agg_fun: str) -> np.ndarray:
+    """
+    Summarizes consecutive groups of values in a single vectorized pass,
+        ignoring NaNs like pandas does.
+
+    Examples:
+        >>> grouped_summary(np.array([1., 2., 3., 5.]), np.array([1, 3]), 'sum')
+        array([ 1., 10.])
+
+        >>> grouped_summary(np.array([1., 2., 3., 5.]), np.array([1, 3]), 'var')
+        array([       nan, 2.33333333])
+
+        >>> grouped_summary(np.array([1., 2., 3.]), np.array([0, 1, 2]), 'var')
+        array([nan, nan, 0.5])
+
+    Args:
+        values: values of all groups one after another
+        lengths: number of values in each group
+        agg_fun: aggregation function; 'sum', 'mean' or 'var' (sample variance)
+
+    Returns:
+        Summary value for each group.
+    """
+    groups = np.repeat(np.arange(len(lengths)), lengths)
+    valid = ~np.isnan(values)
+    values = np.where(valid, values, 0).astype(np.float64)
+
+    sums = np.bincount(groups, weights=values, minlength=len(lengths))
+    if agg_fun == 'sum':
+        return sums
+
+    # NaN for groups with too few values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        counts = np.bincount(groups, weights=valid, minlength=len(lengths))
+        means = sums / counts
+        if agg_fun == 'mean':
+            return means
+
+        squares = np.where(valid, values - means[groups], 0) ** 2
+        ss = np.bincount(groups, weights=squares, minlength=len(lengths))
+        return np.where(counts > 1, ss / (counts - 1), np.nan)
+
+
+@lru_cache(maxsize=128)
+def summarize_stations(data: DailyData,
+                       stations: tuple[str, ...],
+                       first_day: int,
+                       last_day: int,
+                       agg_fun: str) -> tuple[float, ...]:
+    """
+    Summarizes daily precipitation by station over a range of days. Results
+        are cached per data snapshot until daily data is updated.
+
+    Args:
+        data: daily data snapshot
+        stations: station names
+        first_day: first day of the range as an offset from the first date in data
+        last_day: last day of the range as an offset from the first date in data
+        agg_fun: aggregation function; 'sum', 'mean' or 'var'
+
+    Returns:
+        Summary value for each station in the order of `stations`.
+    """
+    by_station = daily_data_by_station(data, stations, first_day, last_day)
+    amounts = [by_station[s][1] for s in stations]
+    summary = grouped_summary(np.concatenate(amounts), np.array([len(a) for a in amounts]), agg_fun)
+    return tuple(summary.tolist())
+
+
 def serve_layout() -> Component:
     """
     Creates app layout so that it is up-to-date with current data.
@@ -154,7 +358,15 @@ def serve_layout() -> Component:
     Returns:
         App layout
     """
-    slider_len = (date_range[1] - date_range[0]).days + 1
+    # load data when the layout is first requested; Dash also calls this
+    #   function outside a request when the app is set up to validate the
+    #   layout, for which the placeholder values are sufficient
+    if flask.has_request_context():
+        ensure_data()
+
+    date_range = daily_data.date_range
+    # the slider's value is a range of day offsets from the first date
+    slider_len = (date_range[1] - date_range[0]).days
     layout = html.Div([
         html.Div([  # left-side container
             html.Div([  # map
@@ -198,7 +410,10 @@ def serve_layout() -> Component:
                         max=slider_len,
                         step=1,
                         value=[0, slider_len],
-                        marks=None
+                        marks=None,
+                        # `value` (and plots) updated once per drag, date pickers
+                        #   follow `drag_value` continuously
+                        updatemode='mouseup'
                     )],
                     style={'width': '93%',
                            'marginTop': '8px'}
@@ -219,7 +434,7 @@ def serve_layout() -> Component:
             html.Div([
                 dcc.Graph(
                     id='scatterplot',
-                    figure=blank_fig(),
+                    figure=BLANK_FIG,
                     config=dict(locale='cs',
                                 displayModeBar=False),
                     style={'height': '100%'}
@@ -228,7 +443,7 @@ def serve_layout() -> Component:
             ),
             html.H2('Sumarizace za vybrané období'),
             html.Div([
-                dcc.RadioItems(create_radio_options(disabled=True),
+                dcc.RadioItems(RADIO_OPTIONS_DISABLED,
                                value='sum',
                                id='summary-radios',
                                inline=True,
@@ -241,7 +456,7 @@ def serve_layout() -> Component:
             html.Div([
                 dcc.Graph(
                     id='barplot',
-                    figure=blank_fig(),
+                    figure=BLANK_FIG,
                     config=dict(locale='cs',
                                 displayModeBar=False),
                     style={'height': '100%'}
@@ -254,11 +469,16 @@ def serve_layout() -> Component:
         # list of available colors
         dcc.Store(
             id='colors-available',
-            data=json.dumps(TRACE_COLORS)),
+            data=TRACE_COLORS),
         # dictionary of already used colors with station names as keys
         dcc.Store(
             id='colors-displayed',
-            data='{}'),
+            data={}),
+        # first date covered by data
+        dcc.Store(
+            id='data-first-date',
+            data=date_range[0].date().isoformat()
+        ),
         # last date covered by data
         dcc.Store(
             id='data-last-date',
@@ -314,104 +534,162 @@ def create_radio_options(disabled: bool = False) -> RadioOptionsType:
     ]
 
 
-station_names_translator = data_db_csv.get_station_name_translator()
+# figures and options returned by callbacks as they are (never mutated)
+BLANK_FIG = blank_fig()
+RADIO_OPTIONS = create_radio_options()
+RADIO_OPTIONS_DISABLED = create_radio_options(disabled=True)
 
-# stations data
-stations_data = data_db_csv.get_stations_data(station_names_translator)
-# sorted station names for the dropdown menu
-stations_list = sorted_locale(stations_data['name'])
+# semi-transparent trace colors used for barplot fill
+TRACE_COLORS_RGBA = {c: hex_to_rgb(c, alpha=.5) for c in TRACE_COLORS}
 
-# "declare" variables used as global in data updating functions
-daily_data = None
-d0 = datetime.fromtimestamp(0, timezone.utc)
-date_range = (d0, d0)
-next_data_update_time = d0
-UPDATE_TIME = time(3, 40)
-# set values to the above variables
-try_data_update()
-
-#region Scattermapbox definition
-fig_map = go.Figure()
-
-# data shared by both Scattermapbox traces
-station_markers = dict(
-    lat=stations_data['lat'],
-    lon=stations_data['lon'],
-    mode='markers',
-    showlegend=False
-)
-
-# bottom markers layer -- selected stations
-fig_map.add_trace(
-    go.Scattermapbox(
-        name="selected_stations",
-        lat=[],
-        lon=[],
-        marker=dict(
-            size=40
-        ),
+def create_map_figure() -> go.Figure:
+    """
+    Creates the map figure with station markers.
+
+    Returns:
+        The map figure.
+    """
+    fig_map = go.Figure()
+
+    # data shared by both Scattermapbox traces (numpy arrays are referenced
+    #   by both traces instead of being converted from Series for each)
+    station_markers = dict(
+        lat=stations_data['lat'].to_numpy(),
+        lon=stations_data['lon'].to_numpy(),
+        mode='markers',
         showlegend=False
     )
-)
-
-# middle markers layer -- inner marker border
-fig_map.add_trace(
-    go.Scattermapbox(
-        **station_markers,
-        marker=dict(
-            size=20,
-            color='white'
+
+    # bottom markers layer -- selected stations
+    fig_map.add_trace(
+        go.Scattermapbox(
+            name="selected_stations",
+            lat=[],
+            lon=[],
+            marker=dict(
+                size=40
+            ),
+            showlegend=False
         )
     )
-)
-
-# upper markers layer -- inside color
-fig_map.add_trace(
-    go.Scattermapbox(
-        **station_markers,
-        marker=dict(
-            size=16,
-            color=stations_data['elevation'],
-            showscale=True,
-            colorscale=TOPO_COLORSCALE,
-            cmin=20,
-            cmax=1603,
-            colorbar=dict(
-                title="Nadmořská<br>výška (m)",
-                lenmode="pixels", len=200,
-                xanchor='left', x=0,
-                yanchor="bottom", y=0,
-                bgcolor='rgba(255, 255, 255, .7)'
+
+    # middle markers layer -- inner marker border
+    fig_map.add_trace(
+        go.Scattermapbox(
+            **station_markers,
+            marker=dict(
+                size=20,
+                color='white'
             )
-        ),
-        hovertemplate='<b>%{customdata[0]}</b><br>'
-                      '%{customdata[1]} m n. m.<extra></extra>',
-        customdata=stations_data.loc[:,
-                   ['name', 'elevation', 'type']]
+        )
     )
-)
-
-fig_map.update_layout(
-    mapbox=dict(
-        style='open-street-map',
-        center=dict(
-            lat=stations_data['lat'].mean(),
-            lon=stations_data['lon'].mean()
+
+    # upper markers layer -- inside color
+    fig_map.add_trace(
+        go.Scattermapbox(
+            **station_markers,
+            marker=dict(
+                size=16,
+                color=stations_data['elevation'].to_numpy(np.int16),
+                showscale=True,
+                colorscale=TOPO_COLORSCALE,
+                cmin=20,
+                cmax=1603,
+                colorbar=dict(
+                    title="Nadmořská<br>výška (m)",
+                    lenmode="pixels", len=200,
+                    xanchor='left', x=0,
+                    yanchor="bottom", y=0,
+                    bgcolor='rgba(255, 255, 255, .7)'
+                )
+            ),
+            hovertemplate='<b>%{customdata[0]}</b><br>'
+                          '%{customdata[1]} m n. m.<extra></extra>',
+            customdata=stations_data[['name', 'elevation', 'type']].to_numpy()
+        )
+    )
+
+    fig_map.update_layout(
+        mapbox=dict(
+            style='open-street-map',
+            center=dict(
+                lat=stations_data['lat'].mean(),
+                lon=stations_data['lon'].mean()
+            ),
+            zoom=6.5
+        ),
+        margin=dict(r=0, t=0, l=0, b=0),
+        coloraxis_colorbar=dict(
+            title="Elevation (m)",
+            xanchor='left', x=.5,
+            yanchor="bottom", y=.5,
+            bgcolor='rgba(255, 255, 255, .7)'
         ),
-        zoom=6.5
-    ),
-    margin=dict(r=0, t=0, l=0, b=0),
-    coloraxis_colorbar=dict(
-        title="Elevation (m)",
-        xanchor='left', x=.5,
-        yanchor="bottom", y=.5,
-        bgcolor='rgba(255, 255, 255, .7)'
-    ),
-    autosize=True,
-)
-#endregion
+        autosize=True,
+    )
+
+    return fig_map
+
+
+def init_data() -> None:
+    """
+    Loads station and precipitation data and creates the map figure, i.e.,
+        sets the global variables declared below. Called through `ensure_data()`
+        so that importing this module does not touch the database.
+    """
+    global station_names_translator
+    global stations_data
+    global station_sort_keys
+    global stations_list
+    global stations_latlon
+    global fig_map
+
+    station_names_translator = data_db_csv.get_station_name_translator()
+    # stations data
+    stations_data = data_db_csv.get_stations_data(station_names_translator)
+    # locale collation keys of station names used by `sorted_locale()`
+    station_sort_keys = {name: locale.strxfrm(name) for name in stations_data['name']}
+    # sorted station names for the dropdown menu
+    stations_list = sorted_locale(stations_data['name'])
+    # (lat, lon) coordinates by station name
+    stations_latlon = dict(zip(stations_data['name'],
+                               zip(stations_data['lat'].tolist(), stations_data['lon'].tolist())))
+    # set daily data and date range
+    try_data_update()
+    fig_map = create_map_figure()
+
+
+def ensure_data() -> None:
+    """
+    Loads data by `init_data()` unless this process has already done so.
+        Called by the layout and by every server callback, as a callback can
+        reach a process which has not served the layout (e.g. after a worker
+        restart while a page is open).
+    """
+    # `fig_map` is set last by `init_data()`
+    if fig_map is None:
+        with data_init_lock:
+            if fig_map is None:
+                init_data()
+
+
+# "declare" variables set in `init_data()` and data updating functions
+station_names_translator = None
+stations_data = None
+station_sort_keys = {}
+stations_list = None
+stations_latlon = None
+fig_map = None
+# makes concurrent requests of a process load data only once
+data_init_lock = threading.Lock()
+d0 = datetime.fromtimestamp(0, timezone.utc)
+daily_data = DailyData(None, None, {}, (d0, d0))
+next_data_update_time = d0
+UPDATE_TIME = time(3, 40)
 
 pio.templates.default = 'plotly_white'
+# serialize callback outputs (figures in particular) with the fast orjson engine
+pio.json.config.default_engine = 'orjson'
 app = Dash(__name__)
 app.title = 'Srážky v ČR'
 app.layout = serve_layout
@@ -438,49 +716,26 @@ def update_max_date(last_date: str) -> tuple[int, dict, datetime, datetime]:
             `max_date_allowed` for `date-picker-from`,
             `max_date_allowed` for `date-picker-to`
     """
-    # find date range and compute date marks and their positions for the RangeSlider
+    ensure_data()
     last_date = datetime.fromisoformat(last_date)
-    dates_at, slider_marks = date_marks(*date_range)
-    slider_at = (dates_at - date_range[0]).days
+    date_range = daily_data.date_range
     slider_len = (last_date - date_range[0]).days
 
-    return slider_len, dict(zip(slider_at, slider_marks)), last_date, last_date
+    return slider_len, slider_marks(*date_range), last_date, last_date
 
 
-@callback(
+# synchronizes date pickers with the slider and vice versa
+clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='sync_slider_picker_dates'),
     Output('date-picker-from', 'date'),
     Output('date-picker-to', 'date'),
     Output('date-slider', 'value'),
     Input('date-picker-from', 'date'),
     Input('date-picker-to', 'date'),
-    Input('date-slider', 'value'),
+    Input('date-slider', 'drag_value'),
+    State('date-slider', 'value'),
+    State('data-first-date', 'data'),
     prevent_initial_call=True)
-def sync_slider_picker_dates(date_picker_from: str,
-                             date_picker_to: str,
-                             slider_value: list[int]) -> tuple[datetime, datetime, list[int]]:
-    """
-    Synchronizes date pickers with the slider and vice versa.
-
-    Args:
-        date_picker_from: date selected in `date-picker-from`.
-        date_picker_to: date selected in `date-picker-to`.
-        slider_value: value of value-slider
-
-    Returns:
-        A tuple containing (potentially) new values for:
-            `date-picker-from` date,
-            `date-picker-to` date,
-            `date-slider` value
-    """
-    if ctx.triggered_id == 'date-slider':
-        date_picker_from = date_range[0] + timedelta(days=slider_value[0])
-        date_picker_to = date_range[0] + timedelta(days=slider_value[1])
-    elif ctx.triggered_id == 'date-picker-from':
-        slider_value[0] = (datetime.fromisoformat(date_picker_from) - date_range[0]).days
-    else:  # date-picker-to
-        slider_value[1] = (datetime.fromisoformat(date_picker_to) - date_range[0]).days
-
-    return date_picker_from, date_picker_to, slider_value
 
 
 @callback(
@@ -491,24 +746,23 @@ def sync_slider_picker_dates(date_picker_from: str,
     State('colors-available', 'data'),
     prevent_initial_call=True)
 def update_station_colors(selected: list[str],
-                          displayed: str,
-                          available: str) -> tuple[str, str]:
+                          displayed: dict[str, str],
+                          available: list[str]) -> tuple[dict[str, str], list[str]]:
     """
     Updates the lists of displayed and available colors after a change in
     the stations dropdown menu.
 
     Args:
         selected: stations selected in the dropdown
-        displayed: JSON dump of the list of displayed stations' colors
-        available: JSON dump of the dictionary of available colors
+        displayed: dictionary of displayed stations' colors
+        available: list of available colors
 
     Returns:
-        A tuple containing JSON dumps of:
+        A tuple containing:
             displayed colors,
             available colors.
     """
-    available = json.loads(available)
-    displayed = json.loads(displayed)
+    ensure_data()
     # newly selected stations
     new = [s for s in selected if s not in displayed]
     # newly unselected stations
@@ -524,39 +778,31 @@ def update_station_colors(selected: list[str],
         # return dropped stations' colors to available
         available = [displayed.pop(d) for d in dropped] + available
 
-    return json.dumps(displayed), json.dumps(available)
+    return displayed, available
 
 
 @callback(
     Output('map', 'figure'),
-    Input('colors-displayed', 'data'),
-    State('map', 'figure'))
-def update_map_highlighted_stations(displayed: str, map_fig: go.Figure) -> go.Figure:
+    Input('colors-displayed', 'data'))
+def update_map_highlighted_stations(displayed: dict[str, str]) -> Patch:
     """
     Updates stations highlighted in the map according to 'colors-displayed'.
 
     Args:
-        displayed: JSON dump of displayed stations' colors
-        map_fig: map figure
+        displayed: dictionary of displayed stations' colors
 
     Returns:
-        Updated map figure.
-    """
-    displayed = json.loads(displayed)
-
-    # highlight selected stations in the map
-    latlon = stations_data.loc[displayed.keys(), ['lat', 'lon']]
-    map_fig = go.Figure(map_fig)
-    map_fig.update_traces(
-        lat=latlon['lat'],
-        lon=latlon['lon'],
-        marker=dict(
-            color=list(displayed.values())
-        ),
-        selector=dict(name='selected_stations')
-    )
+        Patch of the map figure.
+    """
+    ensure_data()
+    # highlight selected stations in the map by patching only the
+    #   'selected_stations' trace (the first one)
+    map_patch = Patch()
+    map_patch['data'][0]['lat'] = [stations_latlon[s][0] for s in displayed]
+    map_patch['data'][0]['lon'] = [stations_latlon[s][1] for s in displayed]
+    map_patch['data'][0]['marker']['color'] = list(displayed.values())
 
-    return map_fig
+    return map_patch
 
 
 @callback(
@@ -567,132 +813,114 @@ def update_map_highlighted_stations(displayed: str, map_fig: go.Figure) -> go.Fi
     Input('colors-displayed', 'data'),
     Input('date-slider', 'value'),
     Input('summary-radios', 'value'))
-def draw_station_plots(displayed: str,
+def draw_station_plots(displayed: dict[str, str],
                        slider: list[int, int],
                        agg_fun: str) -> tuple[go.Figure, go.Figure, RadioOptionsType, str]:
     """
     Draws plots for currently selected stations.
 
     Args:
-        displayed: JSON dump of the dictionary of displayed stations' colors
+        displayed: dictionary of displayed stations' colors
         slider: endpoints of date slider's selection
         agg_fun: function used for aggregation by stations
 
     Returns:
         A tuple containing:
-            scatterplot figure,
-            barplot figure,
+            scatterplot figure (or its patch),
+            barplot figure (or its patch),
             summary radio options,
             last date
     """
-    displayed = json.loads(displayed)
-    stations = sorted_locale(displayed.keys())
+    ensure_data()
+    stations = list(sorted_stations(frozenset(displayed)))
 
     # try to update daily data when it is time to do so
     if datetime.now(timezone.utc) > next_data_update_time:
         try_data_update()
-    last_date = date_range[1].date().isoformat()
+    # all data come from the same (possibly concurrently replaced) snapshot
+    data = daily_data
+    last_date = data.date_range[1].date().isoformat()
 
     # blank figures and disabled options when there's nothing to display
     if not displayed:
-        return blank_fig(), blank_fig(), create_radio_options(disabled=True), last_date
-
-    date_display_range = pd.date_range(
-        date_range[0] + timedelta(days=slider[0]),
-        date_range[0] + timedelta(days=slider[1]))
-    # copy() at the end needed so that a SettingWithCopyWarning is not issued later on
-    df = daily_data.loc[
-        daily_data.index.get_level_values('station_idx').isin(displayed.keys()) &
-        daily_data.index.get_level_values('date_idx').isin(date_display_range)].copy()
+        return BLANK_FIG, BLANK_FIG, RADIO_OPTIONS_DISABLED, last_date
 
     # don't redraw the scatterplot when just changing summary function
     if ctx.triggered_id == 'summary-radios':
         scatter = no_update
+    # the same stations are displayed, replace only data of their traces
+    elif ctx.triggered_id == 'date-slider':
+        scatter = Patch()
+        by_station = daily_data_by_station(data, stations, slider[0], slider[1])
+        trace_type = scatter_trace_class(by_station)().type
+        for i, station in enumerate(stations):
+            dates, amounts = by_station[station]
+            scatter['data'][i]['type'] = trace_type
+            scatter['data'][i]['x'] = dates
+            scatter['data'][i]['y'] = amounts
+            scatter['data'][i]['marker']['size'] = marker_sizes(amounts)
     else:
         scatter = go.Figure()
+        by_station = daily_data_by_station(data, stations, slider[0], slider[1])
+        trace_class = scatter_trace_class(by_station)
 
-        # markers for values of 0 will not be shown
-        df.loc[:, 'm_size'] = [0 if a == 0 else 7 for a in df['amount']]
-
-        # add a line and marker traces for each station
+        # create a single line and markers trace for each station
+        traces = []
         for station in stations:
-            df_station = df.loc[df.index.get_level_values('station_idx') == station]
-            fig_data = dict(
-                x=df_station['date'],
-                y=df_station['amount'])
-            # lines
-            scatter.add_trace(go.Scatter(
-                **fig_data,
-                mode='lines',
+            # plain numpy arrays take Plotly's fast path for validation and encoding
+            dates, amounts = by_station[station]
+            traces.append(trace_class(
+                x=dates,
+                y=amounts,
+                mode='lines+markers',
                 name=station,
                 line=dict(
                     color=displayed[station]
-                )))
-            # markers
-            scatter.add_trace(go.Scatter(**fig_data,
-                mode='markers',
+                ),
                 marker=dict(
-                    size=df_station['m_size'],
+                    size=marker_sizes(amounts),
                     color=displayed[station]
                 ),
-                name=station,
                 hovertemplate='%{y} mm<br>'
-                              '%{x|%-d. %m. %Y}',
-                showlegend=False))
+                              '%{x|%-d. %m. %Y}'))
+        scatter.add_traces(traces)
         scatter.update_xaxes(tickformat='%-d. %b\n%Y')  # unlike Windows, Dash uses '%-d'
         scatter.update_layout(margin=dict(l=50, r=50, b=50, t=0))
 
-    # create the barplot
-    agg = df.groupby('station', observed=True, as_index=True).agg({'amount': agg_fun})
-    agg = agg.loc[stations]
-    agg.reset_index(inplace=True)
+    # summarize each station's data for the barplot
+    agg = summarize_stations(data, tuple(stations), slider[0], slider[1], agg_fun)
+
+    # the same stations are displayed, replace only bar heights
+    if ctx.triggered_id in ('date-slider', 'summary-radios'):
+        barplot = Patch()
+        barplot['data'][0]['y'] = agg
+        return scatter, barplot, RADIO_OPTIONS, last_date
 
     barplot = go.Figure()
     barplot.add_trace(go.Bar(
-        x=agg['station'],
-        y=agg['amount'],
-        marker_color=[hex_to_rgb(displayed[s], alpha=.5) for s in agg['station']],
-        marker_line_color=[displayed[s] for s in agg['station']],
+        x=stations,
+        y=agg,
+        marker_color=[TRACE_COLORS_RGBA[displayed[s]] for s in stations],
+        marker_line_color=[displayed[s] for s in stations],
         marker_line_width=3
     ))
     barplot.update_layout(margin=dict(l=50, r=50, b=50, t=0))
     # make bars narrower
     barplot.update_traces(width=.05 + (len(displayed)-1)*.05)
 
-    return scatter, barplot, create_radio_options(), last_date
+    return scatter, barplot, RADIO_OPTIONS, last_date
 
 
-@callback(
+# updates selected stations after a station is clicked in the map
+clientside_callback(
+    ClientsideFunction(namespace='clientside', function_name='map_station_clicked'),
     Output('dropdown-stations', 'value'),
     Output('map', 'clickData'),
     Input('map', 'clickData'),
     State('dropdown-stations', 'value'),
     prevent_initial_call=True)
-def map_station_clicked(click_map, selected):
-    """
-    Updates selected stations after a station is clicked in the map.
-
-    Args:
-        click_map: click data from `map`
-        selected: stations selected in the dropdown
-
-    Returns:
-        A tuple containing:
-            updated stations dropdown value.
-            cleared `map`'s click data
-    """
-
-    # remove clicked station from selected when present, add otherwise
-    station = click_map['points'][0]['customdata'][0]
-    try:
-        selected.remove(station)
-    except ValueError:
-        selected.append(station)
-
-    # set 'map's 'clickData' to 'None' so that repeated clicks on the same
-    #   feature are not ignored
-    return selected, None
 
 
 if __name__ == '__main__':
+    ensure_data()
     app.run(debug=False)
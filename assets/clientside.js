@@ -0,0 +1,85 @@
+// Clientside callbacks, used in app.py via ClientsideFunction('clientside', <name>)
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// milliseconds since epoch (UTC midnight) of a date in ISO format, time part is ignored
+function dateToMs(date) {
+    return Date.parse(date.slice(0, 10));
+}
+
+// ISO date (yyyy-mm-dd) of milliseconds since epoch
+function msToDate(ms) {
+    return new Date(ms).toISOString().slice(0, 10);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        /**
+         * Synchronizes date pickers with the slider and vice versa.
+         *
+         * Only the components which did not trigger the callback are updated.
+         * Date pickers follow the slider while it is being dragged.
+         *
+         * @param {string} datePickerFrom date selected in `date-picker-from`
+         * @param {string} datePickerTo date selected in `date-picker-to`
+         * @param {number[]} sliderDragValue drag value of `date-slider`
+         * @param {number[]} sliderValue value of `date-slider`
+         * @param {string} firstDate first date covered by data
+         * @returns {Array} new values (or `no_update`) for `date-picker-from` date,
+         *     `date-picker-to` date and `date-slider` value
+         */
+        sync_slider_picker_dates: function(datePickerFrom, datePickerTo, sliderDragValue,
+                                           sliderValue, firstDate) {
+            const noUpdate = window.dash_clientside.no_update;
+            const triggeredId = window.dash_clientside.callback_context.triggered[0].prop_id.split('.')[0];
+            const firstMs = dateToMs(firstDate);
+
+            if (triggeredId === 'date-slider') {
+                // date pickers already showing the dates are not updated (the
+                //   slider also sets `drag_value` when it is mounted)
+                const dateFrom = msToDate(firstMs + sliderDragValue[0] * DAY_MS);
+                const dateTo = msToDate(firstMs + sliderDragValue[1] * DAY_MS);
+                return [dateFrom === (datePickerFrom || '').slice(0, 10) ? noUpdate : dateFrom,
+                        dateTo === (datePickerTo || '').slice(0, 10) ? noUpdate : dateTo,
+                        noUpdate];
+            }
+
+            // a date picker has been cleared
+            const date = triggeredId === 'date-picker-from' ? datePickerFrom : datePickerTo;
+            if (!date) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            const day = Math.round((dateToMs(date) - firstMs) / DAY_MS);
+            const newValue = triggeredId === 'date-picker-from' ?
+                [day, sliderValue[1]] : [sliderValue[0], day];
+            return [noUpdate, noUpdate, newValue];
+        },
+
+        /**
+         * Updates selected stations after a station is clicked in the map.
+         *
+         * @param {Object} clickMap click data from `map`
+         * @param {string[]} selected stations selected in the dropdown
+         * @returns {Array} updated stations dropdown value and cleared `map`'s
+         *     click data
+         */
+        map_station_clicked: function(clickMap, selected) {
+            const point = clickMap.points[0];
+            // clicks outside station markers (e.g. on the highlighting layer)
+            if (!point.customdata) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            // remove clicked station from selected when present, add otherwise
+            const station = point.customdata[0];
+            selected = selected || [];
+            const updated = selected.includes(station) ?
+                selected.filter(s => s !== station) : selected.concat([station]);
+
+            // set `map`'s `clickData` to null so that repeated clicks on the same
+            //   feature are not ignored
+            return [updated, null];
+        }
+    }
+});
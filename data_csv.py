@@ -6,18 +6,47 @@ and wide data formats.
 import logging_config
 from utils import *
 
+import os
 from os import path
+import numpy as np
 import pandas as pd
-import glob
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from typing import Generator
 
 # CSV files location
 CSV_DIR = 'data/daily'
+# names of hourly precipitation columns
+HOUR_COLS = [str(h + 1) for h in range(24)]
+# column types of precipitation tables (known types spare `read_csv` type inference)
+PRECIP_DTYPES = {'Stanice': str} | {h: 'float32' for h in HOUR_COLS}
+# CSV parser used by `read_precip_table`: 'arrow' for multithreaded parsing
+#   by PyArrow (needs the `pyarrow` package), 'pandas' for the default one
+CSV_ENGINE = os.environ.get('PRECIP_CSV_ENGINE', 'pandas')
+# CSV file names (without extension) are dates in ISO format
+CSV_NAME_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
 
 logger = logging_config.get_local_logger(__name__)
 
 
+def hour_datetimes(date: str) -> np.ndarray:
+    """
+    Creates datetimes of hourly measurements of a day with time set to
+        the middle of the previous hour (e.g. 22:30 for 23).
+
+    Args:
+        date: day of measurements
+
+    Returns:
+        24 datetimes as strings in `yyyy-mm-dd hh:mm:ss` format.
+    """
+    day = convert_date(date).strftime('%Y-%m-%d')
+    return np.array([f'{day} {h:02d}:30:00' for h in range(24)], dtype=object)
+
+
 def precip_table_to_long(df: pd.DataFrame, date: str) -> pd.DataFrame:
     """
     Converts a one-day precipitation table from wide to long format
@@ -28,17 +57,20 @@ def precip_table_to_long(df: pd.DataFrame, date: str) -> pd.DataFrame:
 
     Returns:
         One-day precipitation table in long format with columns `station`,
-            `amount` and `datetime`.
+            `amount` and `datetime`; missing values are left out.
     """
 
-    # reshape into three columns: Stanice, hour, precip
-    long = pd.melt(df, id_vars=['Stanice'], var_name='hour', value_name='precip')
-    long.rename(columns={'Stanice': 'station', 'precip': 'amount'}, inplace=True)
-    # create 'datetime' column with time set to the middle of the previous hour (e.g. 22:30 for 23)
-    long['datetime'] = convert_date(date) + pd.to_timedelta(
-        long['hour'].astype(int) - .5, unit='hours')
-    long['datetime'] = long['datetime'].astype(str)
-    long.drop('hour', axis=1, inplace=True)
+    times = hour_datetimes(date)
+
+    # reshape by rows (station after station) into three columns, leaving out
+    #   missing values
+    amounts = df.loc[:, HOUR_COLS].to_numpy().ravel()
+    present = ~np.isnan(amounts)
+    long = pd.DataFrame({
+        'station': np.repeat(df['Stanice'].to_numpy(), 24)[present],
+        'amount': amounts[present],
+        'datetime': np.tile(times, df.shape[0])[present]
+    })
 
     return long
 
@@ -54,15 +86,15 @@ def precip_table_to_wide(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         Precipitation table in wide format (columns `Stanice` followed by `1`..`24`)
     """
-    df = df.copy()
-    # extract hour as a new column (1..24) and drop 'datetime'
-    df['hour'] = pd.DatetimeIndex(df['datetime']).hour + 1
-    df.drop('datetime', axis=1, inplace=True)
+    # row (station) and column (hour 1..24) of each value in the wide table
+    station_codes, stations = pd.factorize(df['station'], sort=True)
+    hours = pd.DatetimeIndex(df['datetime']).hour.to_numpy()
 
-    wide = df.pivot(index='station', columns='hour', values='amount')
-    wide.columns = wide.columns.astype(str)
-    wide.reset_index(inplace=True)
-    wide.rename(columns={'station': 'Stanice'})
+    amounts = np.full((len(stations), 24), np.nan)
+    amounts[station_codes, hours] = df['amount'].to_numpy()
+
+    wide = pd.DataFrame(amounts, columns=HOUR_COLS)
+    wide.insert(0, 'Stanice', stations)
 
     return wide
 
@@ -79,7 +111,8 @@ def read_precip_table(date: str, dir: str = CSV_DIR) -> pd.DataFrame:
         Precipitation data.
     """
     file = path.join(dir, date) + '.csv'
-    return pd.read_csv(file)
+    engine = 'pyarrow' if CSV_ENGINE == 'arrow' else 'c'
+    return pd.read_csv(file, usecols=list(PRECIP_DTYPES), dtype=PRECIP_DTYPES, engine=engine)
 
 
 def write_precip_table(df: pd.DataFrame, date: str, dir: str = CSV_DIR) -> None:
@@ -92,7 +125,8 @@ def write_precip_table(df: pd.DataFrame, date: str, dir: str = CSV_DIR) -> None:
         dir: directory where to save the file
     """
     file = path.join(dir, date) + '.csv'
-    df.to_csv(file, index=False)
+    # numeric amounts are written as on the web page (`0`, not `0.0`)
+    df.to_csv(file, index=False, float_format='%g')
 
 
 def stations_from_file(date: str) -> list[str]:
@@ -120,10 +154,25 @@ def get_csv_dates(dir: str = CSV_DIR) -> list[str]:
     Returns:
         List of dates in ISO format.
     """
-    files = glob.glob(dir + '/*.csv')
-    # remove extensions
-    file_names = [path.basename(f)[:-4] for f in files]
-    return [n for n in file_names if re.fullmatch(r'\d{4}-\d{2}-\d{2}', n)]
+    # names of CSV files without extensions
+    with os.scandir(dir) as entries:
+        file_names = [e.name[:-4] for e in entries
+                      if e.name.endswith('.csv') and e.is_file()]
+    return [n for n in file_names if CSV_NAME_RE.fullmatch(n)]
+
+
+def read_precip_table_long(date: str, dir: str = CSV_DIR) -> pd.DataFrame:
+    """
+    Reads precipitation data from a CSV file and converts them to long format.
+
+    Args:
+        date: date in ISO format
+        dir: directory where the file is located
+
+    Returns:
+        Precipitation data in long format.
+    """
+    return precip_table_to_long(read_precip_table(date, dir), date)
 
 
 def provide_data_for_dates(dates: list[str],
@@ -140,29 +189,36 @@ def provide_data_for_dates(dates: list[str],
     Returns:
         Data generator.
     """
-    df_batch = None  # used to accumulate data for one batch
-    for date in dates:
-        df = read_precip_table(date, dir)
-        df = precip_table_to_long(df, date)
-
-        if df.shape[0] > max_rows:
-            message = (f'Data for {date} has more rows ({df.shape[0]}) '
-                       f'than allowed by `max_rows` ({max_rows}). '
-                       f'Consider increasing `max_rows`.')
-            logger.error(message)
-            raise RuntimeError(message)
-
-        if df_batch is None:
-            df_batch = df
-        else:
-            # concatenate dataframes when max_rows is not exceeded
-            if (df_batch.shape[0] + df.shape[0]) <= max_rows:
-                df_batch = pd.concat([df_batch, df], sort=False)
-            # insert batch into DB and start a new one
-            else:
-                yield df_batch
-                df_batch = df
-
-    # insert what is left after the last loop run
-    if df_batch is not None:
-        yield df_batch
\ No newline at end of file
+    batch = []  # used to accumulate data for one batch
+    batch_rows = 0
+    read = partial(read_precip_table_long, dir=dir)
+    workers = os.cpu_count() or 1
+    # files are read by parallel processes while batches are being consumed,
+    #   at most `2 * workers` files ahead so that tables read but not yet
+    #   consumed do not pile up in memory
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        to_read = iter(dates)
+        pending = deque((d, pool.submit(read, d)) for d in islice(to_read, 2 * workers))
+        while pending:
+            date, future = pending.popleft()
+            df = future.result()
+            pending.extend((d, pool.submit(read, d)) for d in islice(to_read, 1))
+            if df.shape[0] > max_rows:
+                message = (f'Data for {date} has more rows ({df.shape[0]}) '
+                           f'than allowed by `max_rows` ({max_rows}). '
+                           f'Consider increasing `max_rows`.')
+                logger.error(message)
+                raise RuntimeError(message)
+
+            # yield the batch (concatenated just once) and start a new one
+            #   when max_rows would be exceeded
+            if batch and batch_rows + df.shape[0] > max_rows:
+                yield pd.concat(batch, sort=False)
+                batch = []
+                batch_rows = 0
+            batch.append(df)
+            batch_rows += df.shape[0]
+
+    # yield what is left after the last loop run
+    if batch:
+        yield pd.concat(batch, sort=False)
@@ -10,15 +10,26 @@ import logging_config
 import credentials
 
 import pandas as pd
+from functools import lru_cache
 
 
 logger = logging_config.get_local_logger(__name__)
 
-db = database.PrecipitationDB(
-    host=credentials.DB_HOST,
-    user=credentials.DB_USER,
-    password=credentials.DB_PASSWORD,
-    database=credentials.DB_DATABASE)
+
+@lru_cache(maxsize=1)
+def get_db() -> database.PrecipitationDB:
+    """
+    Provides the database object, creating it on first use rather than
+        when the module is imported.
+
+    Returns:
+        The database
+    """
+    return database.PrecipitationDB(
+        host=credentials.DB_HOST,
+        user=credentials.DB_USER,
+        password=credentials.DB_PASSWORD,
+        database=credentials.DB_DATABASE)
 
 
 def fill_stations_table() -> None:
@@ -27,7 +38,20 @@ def fill_stations_table() -> None:
     NOT SUPPOSED TO BE USED at the moment.
     """
     stations = pd.read_csv('data/stations_data.csv')
-    db.insert_stations(stations)
+    get_db().insert_stations(stations)
+    fetch_stations_data.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def fetch_stations_data() -> pd.DataFrame:
+    """
+    Reads station data from the database. Stations change only by
+        `fill_stations_table`, so the data are read just once and cached.
+
+    Returns:
+        Stations data as stored in the database (must not be modified)
+    """
+    return get_db().get_stations_data()
 
 
 def get_stations_data(name_translator: TranslatorType = None) -> pd.DataFrame:
@@ -41,8 +65,10 @@ def get_stations_data(name_translator: TranslatorType = None) -> pd.DataFrame:
     Returns:
         Stations data
     """
-    df = db.get_stations_data()
-    df['elevation'] = df['elevation'].astype(int)
+    df = fetch_stations_data().copy()
+    # the smallest sufficient dtypes halve memory traffic in later operations
+    df['elevation'] = df['elevation'].astype('int16')
+    df[['lat', 'lon']] = df[['lat', 'lon']].astype('float32')
     if name_translator is not None:
         df['name'] = name_translator(df['name'])
     df.set_index('name', inplace=True, drop=False)
@@ -58,19 +84,26 @@ def get_daily_precipitation(station_translator: TranslatorType = None) -> pd.Dat
         station_translator: station name translator
 
     Returns:
-        Daily precipitation data for every station.
+        Daily precipitation data for every station indexed by `station`
+            and `date`.
     """
-    df = db.get_daily_precipitation()
+    df = get_db().get_daily_precipitation()
+    # all stations are known in advance, so their names need not be collected
+    #   from the data
+    stations_dtype = pd.CategoricalDtype(fetch_stations_data()['name'])
+    df['station'] = df['station'].astype(stations_dtype)
     if station_translator is not None:
-        df['station'] = station_translator(df['station'])
-    df['station'] = df['station'].astype('category')
-    df['amount'] = df['amount'].astype(float)
+        # only the categories are translated, not every row
+        stations = df['station'].cat
+        df['station'] = stations.rename_categories(station_translator(stations.categories))
+    df['amount'] = df['amount'].astype('float32')
     df['date'] = pd.to_datetime(df['date'])
 
-    # create a multiindex from 'station' and 'date' naming the levels 'station_idx' and 'date_idx'
-    df.rename(columns={'station': 'station_idx', 'date': 'date_idx'}, inplace=True)
-    df.set_index(['station_idx', 'date_idx'], inplace=True, drop=False)
-    df.rename(columns={'station_idx': 'station', 'date_idx': 'date'}, inplace=True)
+    # stations and dates are kept only in the index
+    #   ('station' keeps the categorical dtype so lookups work on integer codes)
+    df.set_index(['station', 'date'], inplace=True)
+    # sorted index allows fast slicing by stations and date ranges
+    df.sort_index(inplace=True)
 
     return df
 
@@ -83,15 +116,17 @@ def update_db_precipitation_from_dir(dir: str = csv.CSV_DIR) -> None:
         dir: directory to read files from
     """
 
-    # find dates already present in the DB
-    dates_db = db.get_precipitation_dates()
-    dates_db = [str(d) for d in dates_db]
+    # one connection for both reading and inserting
+    with get_db().session():
+        # find dates already present in the DB
+        dates_db = get_db().get_precipitation_dates()
+        dates_db = {str(d) for d in dates_db}
 
-    # find CSV files for dates not yet present in the DB
-    dates_csv = csv.get_csv_dates(dir)
-    dates_csv_new = [d for d in dates_csv if d not in dates_db]
+        # find CSV files for dates not yet present in the DB
+        dates_csv = csv.get_csv_dates(dir)
+        dates_csv_new = [d for d in dates_csv if d not in dates_db]
 
-    update_db_precipitation_for_dates(dates_csv_new)
+        update_db_precipitation_for_dates(dates_csv_new, dir)
 
 
 def update_db_precipitation_for_dates(dates: list[str],
@@ -111,26 +146,28 @@ def update_db_precipitation_for_dates(dates: list[str],
 
     logger.info(f'Data will be inserted into database for {len(dates)} date(s): {", ".join(dates)}')
     data = csv.provide_data_for_dates(dates=dates, dir=dir, max_rows=max_rows)
-    db.insert_precip_data(data)
+    get_db().insert_precip_data(data)
 
 
+@lru_cache(maxsize=1)
 def get_station_name_translator() -> TranslatorType:
     """
-    Creates a station name translator function.
+    Creates a station name translator function. The translation table is
+        read only once, later calls return the same translator.
 
     Returns:
         The translator
     """
     df = pd.read_csv('data/stations_data.csv')
-    d = dict(zip(df['precip_known'], df['final']))
+    d = pd.Series(df['final'].to_numpy(), index=df['precip_known'])
 
-    return lambda names: [d[n] for n in names]
+    return lambda names: pd.Series(names).map(d).to_numpy()
 
 
 def get_max_db_date() -> datetime.date:
-    return db.get_max_date()
+    return get_db().get_max_date()
 
-# db.create_tables()
+# get_db().create_tables()
 # fill_stations_table()
 
 # update_db_precipitation_from_dir()
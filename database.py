@@ -1,8 +1,11 @@
 import logging_config
 
 from datetime import datetime
+from os import path
+import numpy as np
 import pandas as pd
-from mysql.connector import connect
+import tempfile
+from mysql.connector import connect, errorcode, Error
 from contextlib import contextmanager
 from typing import Generator
 
@@ -19,17 +22,40 @@ STATION_TABLE_COLS = {
 }
 
 
+# maximum number of rows in one multi-row INSERT statement
+INSERT_CHUNK_ROWS = 5000
+# number of rows fetched at once from large query results
+FETCH_CHUNK_ROWS = 10000
+# errors raised by LOAD DATA LOCAL INFILE when either the client or the server
+#   does not allow it
+LOCAL_INFILE_DISABLED_ERRORS = (errorcode.ER_CLIENT_LOCAL_FILES_DISABLED,
+                                errorcode.ER_NOT_ALLOWED_COMMAND)
+
+
 class PrecipitationDB:
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, local_infile=True):
+        # when `local_infile` is False (or the server turns out not to allow
+        #   it), data are inserted by multi-row INSERT statements instead of
+        #   LOAD DATA
+        self.local_infile = local_infile
         self.dbconfig = dict(
             host=host,
             user=user,
             password=password,
-            database=database)
+            database=database,
+            # needed for bulk loading of data from CSV files
+            allow_local_infile=local_infile)
+        # connection shared by all queries while a session is active
+        self.session_connection = None
 
 
     @contextmanager
     def get_connection(self):
+        # reuse the connection of an active session
+        if self.session_connection is not None:
+            yield self.session_connection
+            return
+
         connection = connect(**self.dbconfig)
         try:
             yield connection
@@ -37,6 +63,25 @@ class PrecipitationDB:
             connection.close()
 
 
+    @contextmanager
+    def session(self):
+        """
+        Keeps one connection open for all queries made within the `with` block
+            instead of connecting for each of them.
+        """
+        # nested sessions use the outer one's connection
+        if self.session_connection is not None:
+            yield
+            return
+
+        with self.get_connection() as connection:
+            self.session_connection = connection
+            try:
+                yield
+            finally:
+                self.session_connection = None
+
+
     def get_daily_precipitation(self) -> pd.DataFrame:
         """
         Retrieves daily precipitation by stations.
@@ -56,12 +101,16 @@ class PrecipitationDB:
             FROM daily d
             JOIN stations s ON d.station_id = s.id
             '''
+        # rows are fetched in chunks converted right away to typed numpy arrays
+        dtype = [('station', object), ('date', 'datetime64[D]'), ('amount', 'float32')]
+        chunks = [np.empty(0, dtype=dtype)]
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(query)
-                res = cursor.fetchall()
+                while rows := cursor.fetchmany(FETCH_CHUNK_ROWS):
+                    chunks.append(np.array(rows, dtype=dtype))
 
-        df = pd.DataFrame(res, columns=['station', 'date', 'amount'])
+        df = pd.DataFrame(np.concatenate(chunks))
         return df
 
 
@@ -89,40 +138,74 @@ class PrecipitationDB:
         """
         Inserts precipitation data in the 'hourly_precip' SQL table.
 
+        LOAD DATA LOCAL INFILE turns duplicate-key errors into warnings and
+            skips such rows, so the number of loaded rows is checked and nothing
+            is committed when some rows were not inserted.
+
         Args:
             data: precipitation data in long format
+
+        Raises:
+            RuntimeError: when some rows were skipped by LOAD DATA
         """
         queries = [
-            # temporary table to store data
-            '''
-            CREATE TEMPORARY TABLE tmp (
-                station VARCHAR(100), 
-                amount DECIMAL(4, 1),
-                datetime DATETIME
-            );
+            # station IDs by names
+            'SELECT name, id FROM stations;',
+            # insert data from a CSV file (loaded in bulk by the server, without
+            #   parsing an INSERT for every row)
+            r'''
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE hourly_precip
+            FIELDS TERMINATED BY ','
+            LINES TERMINATED BY '\n'
+            (station_id, amount, datetime);
             ''',
-            # populate the temporary table
-            'INSERT INTO tmp VALUES (%s, %s, %s);',
-            # get station IDs and insert the data in 'hourly_precip'
-            '''
-            INSERT INTO hourly_precip
-            SELECT s.id AS station_id, t.datetime, t.amount 
-            FROM tmp t
-            JOIN stations s ON t.station = s.name;
-            '''
+            # alternatively, insert them by INSERTs of many rows each
+            'INSERT INTO hourly_precip (station_id, amount, datetime) VALUES '
         ]
 
-        with self.get_connection() as conn:
+        with self.get_connection() as conn, tempfile.TemporaryDirectory() as tmp_dir:
+            file = path.join(tmp_dir, 'precip.csv')
             with conn.cursor() as cursor:
+                # station names are replaced by IDs here so that data can be
+                #   inserted directly in 'hourly_precip'
                 cursor.execute(queries[0])
+                station_ids = dict(cursor.fetchall())
                 for d in data:
+                    d['station_id'] = d['station'].map(station_ids)
+                    # rows of unknown stations are not inserted
                     d.dropna(inplace=True)
-                    logger.info(f'Inserting {d.shape[0]} rows into database temporary table.')
-                    # make tuples from data
-                    d = d.loc[:, ['station', 'amount', 'datetime']].itertuples(index=False, name=None)
-                    cursor.executemany(queries[1], list(d))
-                logger.info(f'Copying data from temporary table to hourly_precip.')
-                cursor.execute(queries[2])
+                    d = d.loc[:, ['station_id', 'amount', 'datetime']].astype({'station_id': int})
+                    logger.info(f'Inserting {d.shape[0]} rows into hourly_precip.')
+                    if self.local_infile:
+                        d.to_csv(file, index=False, header=False, lineterminator='\n')
+                        try:
+                            cursor.execute(queries[1], (file,))
+                        except Error as e:
+                            if e.errno not in LOCAL_INFILE_DISABLED_ERRORS:
+                                raise
+                            # nothing was loaded; use INSERTs from now on
+                            logger.warning(f'LOAD DATA LOCAL INFILE is disabled ({e}), '
+                                           f'falling back to multi-row INSERTs.')
+                            self.local_infile = False
+                        else:
+                            # rows with duplicate keys are skipped without an error
+                            if cursor.rowcount != d.shape[0]:
+                                conn.rollback()
+                                message = (f'Only {cursor.rowcount} of {d.shape[0]} rows '
+                                           f'were loaded into hourly_precip (duplicate '
+                                           f'keys?); no data were inserted.')
+                                logger.error(message)
+                                raise RuntimeError(message)
+                            continue
+                    # one statement (and round trip) per chunk of rows
+                    #   (amounts rounded to one decimal place as float32 values
+                    #   would be sent with spurious digits)
+                    rows = d.astype({'amount': float}).round({'amount': 1}).to_numpy(object)
+                    for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+                        chunk = rows[i:i + INSERT_CHUNK_ROWS]
+                        query = queries[2] + ', '.join(['(%s, %s, %s)'] * len(chunk))
+                        cursor.execute(query, chunk.ravel().tolist())
                 conn.commit()
 
 
@@ -170,12 +253,12 @@ class PrecipitationDB:
         """
         query = (f'INSERT INTO stations ({",".join(STATION_TABLE_COLS.keys())}) '
                  f"VALUES ({','.join(['%s'] * len(STATION_TABLE_COLS.keys()))})")
-        data = stations.loc[:, STATION_TABLE_COLS.values()].itertuples(index=False, name=None)
+        data = stations[list(STATION_TABLE_COLS.values())].itertuples(index=False, name=None)
 
         logger.info(f'Inserting {stations.shape[0]} rows into `stations` table.')
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.executemany(query, list(data))
+                cursor.executemany(query, data)
                 conn.commit()
 
 
@@ -2,21 +2,79 @@
 Functions for downloading and parsing precipitation data.
 """
 
-import utils
 import logging_config
 
-import bs4
-from bs4 import BeautifulSoup
+from bs4 import UnicodeDammit
+import lxml.html
+from lxml import etree
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Generator
 from datetime import date, datetime
 import pandas as pd
 
 logger = logging_config.get_download_logger(__name__)
 
+# compiled XPath expressions locating data in a parsed page
+# the precipitation table
+TABLE_XPATH = etree.XPath('(//div[contains(concat(" ", normalize-space(@class), " "), " tsrz ")]//table)[1]')
+# table rows and row cells
+ROWS_XPATH = etree.XPath('.//tr')
+CELLS_XPATH = etree.XPath('.//td')
+# non-blank strings of an element and the first of them
+STRINGS_XPATH = etree.XPath('.//text()[normalize-space()]')
+FIRST_STRING_XPATH = etree.XPath('string(.//text()[normalize-space()][1])')
+# element with the total number of pages
+N_PAGES_XPATH = etree.XPath('//div[text()[contains(., "Celkov")]]')
+# element with the measurement date
+DATE_XPATH = etree.XPath('//th[starts-with(., "Datum")]')
+# the total number of pages and the date at the end of their elements' text
+N_PAGES_RE = re.compile(r'[0-9]+$')
+DATE_RE = re.compile(r'[0-9]+\.[0-9]+\.[0-9]{4}$')
+
+# timeout (seconds) for page downloads
+REQUEST_TIMEOUT = 10
+# minimum interval (seconds) between starts of two requests to the server
+REQUEST_INTERVAL = .5
+# number of subpages downloaded concurrently
+DOWNLOAD_WORKERS = 4
+
+# one session keeps the connection to the server alive across page downloads;
+#   failed requests are retried with exponentially increasing delays or after
+#   the time the server asks for in its `Retry-After` header
+session = requests.Session()
+session.mount('https://', HTTPAdapter(
+    pool_maxsize=DOWNLOAD_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=.5,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      respect_retry_after_header=True)))
+
+# start time of the last request, guarded by a lock as pages are downloaded
+#   from multiple threads
+last_request_time = 0.
+request_lock = threading.Lock()
+
+
+def wait_for_request_slot() -> None:
+    """
+    Waits until `REQUEST_INTERVAL` passes since the start of the last request
+        so that the server is not flooded by concurrent downloads.
+    """
+    global last_request_time
+    with request_lock:
+        wait = last_request_time + REQUEST_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        last_request_time = time.monotonic()
 
-def extract_n_date(page: BeautifulSoup) -> tuple[int, datetime]:
+
+def extract_n_date(page: lxml.html.HtmlElement) -> tuple[int, date]:
     """
     Extracts the total number of pages and the date precipitation data is for.
 
@@ -29,18 +87,18 @@ def extract_n_date(page: BeautifulSoup) -> tuple[int, datetime]:
             2. measurement date
     """
     # extract the total number of pages
-    n_str = page.find('div', string=re.compile('Celkov')).string.strip()
-    n = int(re.search('[0-9]+$', n_str).group())
+    n_str = N_PAGES_XPATH(page)[0].text_content().strip()
+    n = int(N_PAGES_RE.search(n_str).group())
 
     # extract date
-    dat = page.find('th', string=re.compile('^Datum')).string
-    dat = re.search(r'[0-9]+\.[0-9]+\.[0-9]{4}$', dat).group()
-    dat = utils.convert_date(dat)
+    dat = DATE_XPATH(page)[0].text_content()
+    dat = DATE_RE.search(dat).group()
+    dat = datetime.strptime(dat, '%d.%m.%Y').date()
 
     return n, dat
 
 
-def download_precip_offset(day_offset: int = 0) -> tuple[pd.DataFrame, datetime]:
+def download_precip_offset(day_offset: int = 0) -> tuple[pd.DataFrame, date]:
     """
     Downloads precipitation data for a given day offset.
 
@@ -56,24 +114,39 @@ def download_precip_offset(day_offset: int = 0) -> tuple[pd.DataFrame, datetime]
     page = download_page(day_offset=day_offset)
 
     n, dat = extract_n_date(page)
-    logger.info(f'{n} total pages to be downloaded for {dat.date().isoformat()}')
+    logger.info(f'{n} total pages to be downloaded for {dat.isoformat()}')
+
+    # download the remaining subpages concurrently (results keep their order)
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        pages = [page] + list(executor.map(partial(download_page, day_offset), range(2, n + 1)))
 
     # concatenate all tables for the current day
     data = []
-    for i in range(n):
-        if i > 0:
-            page = download_page(day_offset=day_offset, subpage=i + 1)
+    for i, page in enumerate(pages):
         # extract precipitation table
-        table = page.select_one('div.tsrz table')
-        data += (read_precip_table(table, include_header=i == 0))
-        time.sleep(.5)
-
-    df = pd.DataFrame(data[1:], columns=data[0])
-
-    # keep only 'Stanice' and '1'..'24' columns and remove others
-    to_keep = ['Stanice'] + [str(h+1) for h in range(24)]
-    to_drop = [col for col in df.columns if col not in to_keep]
-    df.drop(to_drop, axis=1, inplace=True)
+        table = TABLE_XPATH(page)[0]
+        data.extend(read_precip_table(table, include_header=i == 0))
+
+    # keep only 'Stanice' and '1'..'24' columns, selected before the data
+    #   frame is created
+    to_keep = {'Stanice'} | {str(h+1) for h in range(24)}
+    keep = [i for i, col in enumerate(data[0]) if col in to_keep]
+    columns = [data[0][i] for i in keep]
+    values = zip(*[[row[i] for i in keep] for row in data[1:]])
+    # hourly amounts as numbers, missing values become NaN
+    by_column = {}
+    invalid = {}  # present but non-numeric values by column
+    for col, vals in zip(columns, values):
+        if col == 'Stanice':
+            by_column[col] = vals
+            continue
+        by_column[col] = pd.to_numeric(vals, errors='coerce')
+        if col_invalid := {v for v, a in zip(vals, by_column[col]) if v is not None and pd.isna(a)}:
+            invalid[col] = sorted(col_invalid)
+    if invalid:
+        logger.warning(f'Non-numeric values for {dat.isoformat()} replaced by NaN '
+                       f'(by column): {invalid}')
+    df = pd.DataFrame(by_column, columns=columns)
 
     return df, dat
 
@@ -89,7 +162,8 @@ def download_precip_date(dat: str, allow_today: bool = False) -> pd.DataFrame:
     Returns:
         Data for the date.
     """
-    offset = date.today() - date.fromisoformat(dat)
+    requested = date.fromisoformat(dat)
+    offset = date.today() - requested
     offset = offset.days
     offset_min = 0 if allow_today else 1
     offset_max = 7
@@ -101,15 +175,16 @@ def download_precip_date(dat: str, allow_today: bool = False) -> pd.DataFrame:
     df, date_df = download_precip_offset(offset)
 
     # in case something weird happened
-    if utils.convert_date(dat) != date_df:
-        message = f'Downloaded precipitation date {date_df.date().isoformat()} is different than requested {dat}; offset: {offset}.'
+    if requested != date_df:
+        message = f'Downloaded precipitation date {date_df.isoformat()} is different than requested {dat}; offset: {offset}.'
         logger.error(message)
         raise RuntimeError(message)
 
     return df
 
 
-def read_precip_table(table: bs4.Tag, include_header: bool = False) -> list[list]:
+def read_precip_table(table: lxml.html.HtmlElement,
+                      include_header: bool = False) -> Generator[list, None, None]:
     """
     Reads precipitation data from an HTML table.
 
@@ -118,20 +193,18 @@ def read_precip_table(table: bs4.Tag, include_header: bool = False) -> list[list
         include_header: Should table column names be read and returned?
 
     Returns:
-        Table as a list of lists
+        Generator of table rows as lists
     """
-    data = []
+    rows = ROWS_XPATH(table)
     # extract table's column names
     if include_header:
-        data = [list(table.tr.stripped_strings)]
-    # read table data
-    for row in table.select('tr')[1:]:
-        data.append([next(cell.stripped_strings, None) for cell in row.select('td')])
-
-    return data
+        yield [s.strip() for s in STRINGS_XPATH(rows[0])]
+    # read table data (the first non-empty string of each cell)
+    for row in rows[1:]:
+        yield [FIRST_STRING_XPATH(cell).strip() or None for cell in CELLS_XPATH(row)]
 
 
-def download_page(day_offset: int = 0, subpage: int = 1) -> BeautifulSoup:
+def download_page(day_offset: int = 0, subpage: int = 1) -> lxml.html.HtmlElement:
     """
     Downloads and parses precipitation for a given day offset.
 
@@ -144,8 +217,12 @@ def download_page(day_offset: int = 0, subpage: int = 1) -> BeautifulSoup:
         Parsed page.
     """
     url = f'https://hydro.chmi.cz/hppsoldv/hpps_act_rain.php?day_offset={day_offset}&startpage={subpage}'
-    resp = requests.get(url)
-    return BeautifulSoup(resp.content, 'html.parser')
+    wait_for_request_slot()
+    resp = session.get(url, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    # decode with the same encoding detection BeautifulSoup uses
+    html = UnicodeDammit(resp.content, is_html=True).unicode_markup
+    return lxml.html.fromstring(html)
 
 
 # dd = str(date.today())
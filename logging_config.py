@@ -5,6 +5,9 @@ formatter = logging.Formatter(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+# one handler per log file, shared by all loggers writing to it
+handlers: dict[str, logging.FileHandler] = {}
+
 
 def setup_logger(name: str, log_file: str, level: int = logging.INFO) -> logging.Logger:
     """
@@ -18,12 +21,19 @@ def setup_logger(name: str, log_file: str, level: int = logging.INFO) -> logging
     Returns:
         New logger.
     """
-    handler = logging.FileHandler(log_file)
-    handler.setFormatter(formatter)
-
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(handler)
+
+    # add a handler only the first time the logger is requested so that
+    #   records are not written repeatedly
+    if not logger.handlers:
+        if log_file not in handlers:
+            # the file is opened only when the first record is written
+            handler = logging.FileHandler(log_file, delay=True)
+            handler.setFormatter(formatter)
+            handlers[log_file] = handler
+        logger.addHandler(handlers[log_file])
+        logger.propagate = False
 
     return logger
 
@@ -1,24 +1,21 @@
 import re
 import json
 from collections import defaultdict
+from itertools import chain
 
 import pandas as pd
 
-with open('data/stanice.js', encoding='utf8') as f:
-    lines = f.readlines()
+# lines which define geometry, capturing the JSON data assigned
+geometry_re = re.compile('var stanice.* = (.*)')
 
-# keep only lines which define geometry
-data = [json.loads(re.sub('.* = ', '', l))['features'] for l in lines
-            if re.match('var stanice', l)]
+with open('data/stanice.js', encoding='utf8') as f:
+    data = [json.loads(m.group(1))['features'] for l in f
+            if (m := geometry_re.match(l))]
 # extract geometry data
 data = [[f['properties'] for f in features] for features in data]
 
 # all into one list
-data_merged = []
-for d in data:
-    data_merged += d
-
-stations_data = pd.DataFrame.from_records(data_merged)
+stations_data = pd.DataFrame.from_records(chain.from_iterable(data))
 stations_data.drop('Column1', axis=1, inplace=True)
 # columns in prevod_stanic.xlsx:
 #   js: name in stanice.js
@@ -38,10 +35,10 @@ both = pd.merge(final, stations_data, left_on='js', right_on='FNAME', how='left'
 both = both.loc[~both['final'].duplicated()]
 both.to_csv('data/stations_data.csv', index=False)
 
-stat = defaultdict(lambda: [])
+stat = defaultdict(list)
 for d in data:
     for one in d:
-        stat[one['FNAME']] += [one]
+        stat[one['FNAME']].append(one)
 
 nam = list(stat.keys())
 vals = list(stat.values())
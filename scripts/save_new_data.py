@@ -20,8 +20,8 @@ def save_new_data(min_offset: int = 1, max_offset: int = 7) -> None:
     # offset-specified dates in ISO format
     dates_recent = [(date.today() - timedelta(days=d)).isoformat()
                     for d in range(min_offset, max_offset + 1)]
-    # dates to be downloaded
-    dates_new = set(dates_recent) - set(dates_csv)
+    # dates to be downloaded, from the oldest
+    dates_new = sorted(set(dates_recent) - set(dates_csv))
 
     dates_merged = '(' + ', '.join(dates_new) + ') ' if len(dates_new) else ''
     logger.info(f'Precipitation data for {len(dates_new)} new dates {dates_merged}'
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Callable, Iterable
 
-TranslatorType = Callable[[Iterable[str]], list[str]]
+TranslatorType = Callable[[Iterable[str]], Iterable[str]]
 
 def convert_date(date: str) -> datetime:
     """
@@ -28,7 +28,7 @@ def convert_date(date: str) -> datetime:
         ...
         ValueError: time data '32.10.2023' does not match format '%d.%m.%Y'
     """
-    try:
+    # choose the parser by format instead of catching the ISO parser's errors
+    if '-' in date:
         return datetime.fromisoformat(date)
-    except ValueError:
-        return datetime.strptime(date, '%d.%m.%Y')
+    return datetime.strptime(date, '%d.%m.%Y')